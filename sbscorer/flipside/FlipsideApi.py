@@ -1,20 +1,155 @@
+import asyncio
+import csv
+import hashlib
+import math
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from shroomdk import ShroomDK
+from shroomdk.errors import QueryRunTimeoutError
+
+# columns of the transactions tables, the native value column is added per network
+TX_COLUMNS = ["TX_HASH", "BLOCK_TIMESTAMP", "FROM_ADDRESS", "TO_ADDRESS", "GAS_LIMIT", "GAS_USED", "TX_FEE"]
+# columns the extraction needs to export per address and to page through time
+EXTRACT_COLUMNS = ["TX_HASH", "BLOCK_TIMESTAMP", "FROM_ADDRESS", "TO_ADDRESS"]
+# file mapping each address to the chunk files holding its transactions when exporting by chunk
+MANIFEST_FILE = "manifest.parquet"
+# network -> (transactions table, native value column)
+TX_TABLES = {
+    "ethereum": ("ethereum.core.fact_transactions", "ETH_VALUE"),
+    "polygon": ("polygon.core.fact_transactions", "MATIC_VALUE"),
+    "arbitrum": ("arbitrum.core.fact_transactions", "ETH_VALUE"),
+    "avalanche": ("avalanche.core.fact_transactions", "AVAX_VALUE"),
+    "gnosis": ("gnosis.core.fact_transactions", None),
+    "optimism": ("optimism.core.fact_transactions", "ETH_VALUE"),
+}
+
+
+def to_arrow_table(df):
+    if isinstance(df, pd.DataFrame):
+        return pa.Table.from_pandas(df, preserve_index=False)
+    return df
+
+
+def lower_address(address_column):
+    # a column with only nulls (e.g. to_address of contract creations) is typed null by arrow
+    # addresses are ascii hex, lowering the raw bytes is enough and avoids decoding utf8
+    return pc.ascii_lower(address_column.cast(pa.string()))
+
+
+def records_to_table(records):
+    """
+    Convert the records of a query page to an arrow table
+
+    Arrow infers the types of the whole columns at once. A column it can not type (e.g. mixing str and int or holding
+    an int above 2**63) is kept as str, like the pd.DataFrame(records) path would have written it.
+    """
+    try:
+        return pa.Table.from_pylist(records)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        pass
+    df = pd.DataFrame(records)
+    arrays = []
+    for column in df.columns:
+        try:
+            arrays.append(pa.array(df[column], from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            arrays.append(pa.array(df[column].map(lambda value: None if pd.isna(value) else str(value)),
+                                   type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+
+
+def unify_type(type_a, type_b):
+    # type to which two types of the same column on different pages are cast
+    if type_a is None or pa.types.is_null(type_a):
+        return type_b
+    if type_a == type_b or pa.types.is_null(type_b):
+        return type_a
+    if pa.types.is_integer(type_a) and pa.types.is_integer(type_b):
+        return pa.int64()
+    numeric_types = (pa.types.is_integer, pa.types.is_floating)
+    if any(is_type(type_a) for is_type in numeric_types) and any(is_type(type_b) for is_type in numeric_types):
+        return pa.float64()
+    return pa.string()
+
+
+def concat_tables(tables):
+    """
+    Concatenate the pages of a query result
+
+    Pages without columns (failed or empty queries) are skipped. promote=True only fills the columns missing or all
+    null on a page, the types that still differ between pages (e.g. a value column typed int64 on a page with only
+    whole numbers and double on the next one) are widened: integers to int64, integers and floats to double and
+    anything else to str.
+    """
+    tables = [table for table in tables if table.num_columns > 0]
+    if len(tables) == 0:
+        return pa.table({})
+    try:
+        return pa.concat_tables(tables, promote=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types[field.name] = unify_type(types.get(field.name), field.type)
+    return pa.concat_tables([table.cast(pa.schema([(name, types[name]) for name in table.column_names]), safe=False)
+                             for table in tables], promote=True)
+
+
+def drop_duplicate_tx(table):
+    # keeps the first occurrence of each tx_hash
+    keep = ~table["tx_hash"].to_pandas().duplicated().values
+    return table.filter(pa.array(keep))
+
+
+def read_csv(csv_file):
+    # the columns are read as text, concat_tables unifies them with the types of the new transactions
+    with open(csv_file, newline="") as file:
+        column_names = next(csv.reader(file))
+    convert_options = pacsv.ConvertOptions(column_types={name: pa.string() for name in column_names},
+                                           strings_can_be_null=True)
+    return pacsv.read_csv(csv_file, convert_options=convert_options)
+
+
+def read_parquet(parquet_file):
+    return pq.read_table(parquet_file)
+
+
+def save_merged(save_file, read_file, df, path_to_export, file_path):
+    # the transactions of an incremental extract are added to the file of the previous extract
+    table = to_arrow_table(df)
+    if os.path.exists(file_path):
+        table = drop_duplicate_tx(concat_tables([read_file(file_path), table]))
+    save_file(table, path_to_export, file_path)
 
 
 def save_csv(df, path_to_export, csv_file):
-    if not os.path.exists(path_to_export):
-        os.makedirs(path_to_export)
-    df.to_csv(csv_file, index=False)
+    # the arrow writer is columnar and native, much faster than the pandas row by row writer
+    pacsv.write_csv(to_arrow_table(df), csv_file, write_options=pacsv.WriteOptions(include_header=True))
+
+
+def save_parquet(df, path_to_export, parquet_file):
+    pq.write_table(to_arrow_table(df), parquet_file, compression='zstd')
 
 
 class FlipsideApi(object):
+    # Shared by all instances, the file writes are I/O bound and independent of each other
+    EXPORT_EXECUTOR = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
 
     def __init__(self, api_key, page_size=100000, timeout_minutes=4, page_number=1, max_address=100, ttl=60,
-                 cached=True, retry_interval=1):
+                 cached=True, retry_interval=1, max_concurrent_queries=4, max_page_workers=8,
+                 export_format="parquet", query_cache_size=16, query_retries=2):
         self.api_key = api_key
 
         # Initialize `ShroomDK`
@@ -38,30 +173,224 @@ class FlipsideApi(object):
         self.CACHED = cached
         # Retry interval in seconds
         self.RETRY_INTERVAL_SECONDS = retry_interval
+        # Number of times a query failing for another reason than a timeout (e.g. rate limited) is retried as is
+        # when extracting transactions, timed out queries are split instead
+        self.QUERY_RETRIES = query_retries
         # The max output size of flipside
         self.MAX_ROWS = 1000000  # 1 million is the max output size of flipside
+        # Max number of queries running at the same time when extracting transactions
+        self.MAX_CONCURRENT_QUERIES = max_concurrent_queries
+        # Max number of pages of the same query fetched at the same time
+        self.MAX_PAGE_WORKERS = max_page_workers
+        # Format of the per address files, "parquet" or "csv" when a downstream tool requires csv
+        # "chunk" writes one parquet file per query instead, with a manifest address -> chunk file
+        if export_format not in ("parquet", "csv", "chunk"):
+            raise Exception("Export format not supported")
+        self.EXPORT_FORMAT = export_format
+        # (extract_dir, network) -> state of the current chunk export: the run id making the chunk file names unique
+        # so an extract never overwrites the files of a previous extract in the same directory, the (address, chunk
+        # file) entries, the addresses whose query succeeded and whether a slice failed
+        self.chunk_manifest = {}
+        self.chunk_manifest_lock = threading.Lock()
+        # Default columns of the transactions query per network
+        self.TX_DEFAULT_COLUMNS = {
+            network: ", ".join(TX_COLUMNS + ([value_column] if value_column else []))
+            for network, (table, value_column) in TX_TABLES.items()
+        }
+        # SQL of the transactions query per network, only the columns, the address list, the block timestamp filter,
+        # the order and the limit are left to format
+        self.TX_SQL_TEMPLATES = {
+            network: "SELECT {columns} "
+                     f"FROM {table} "
+                     "WHERE FROM_ADDRESS IN ({addrs}){filter} OR TO_ADDRESS IN ({addrs}){filter}{order} {limit};"
+            for network, (table, value_column) in TX_TABLES.items()
+        }
+        # Max number of query results kept in memory, they expire after TTL_MINUTES like the flipside query id
+        # Results can be up to MAX_ROWS rows so keep it small, the extraction runs each query once and bypasses it
+        self.QUERY_CACHE_SIZE = query_cache_size
+        self.query_cache = OrderedDict()  # sql hash -> (monotonic time, table)
+        self.query_cache_lock = threading.Lock()
+        # EWMA of the query latency in seconds per network, the timeout of a network is 3 times its latency
+        # bounded to [TIMEOUT_MINUTES / 2, 2 * TIMEOUT_MINUTES], it starts so that the first timeout is TIMEOUT_MINUTES
+        self.latency_ewma = defaultdict(lambda: self.TIMEOUT_MINUTES * 60 / 3)
+        self.latency_lock = threading.Lock()
 
     def execute_query(self, sql):
-        df_size = self.PAGE_SIZE
-        page_number = 1
-        list_df = []
-        while df_size == self.PAGE_SIZE:
-            df = self.execute_query_page(sql, page_number)
-            page_number += 1
-            list_df.append(df)
-            df_size = df.shape[0]
-
-        df = pd.concat(list_df)
-        if df.shape[0] == self.MAX_ROWS:
+        """
+        Execute the query and return all the pages of the result as a dataframe
+
+        Parameters
+        ----------
+        sql : str
+            Query to execute
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe containing the result of the query
+        """
+        return self.execute_query_table(sql).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def execute_query_table(self, sql, network=None, query_status=None):
+        """
+        Execute the query and return all the pages of the result as an arrow table
+
+        Results are cached by the hash of the sql for TTL_MINUTES so retries of the same query do not call the api
+        again. Results with a failed page are not cached, they are empty or truncated.
+        Parameters
+        ----------
+        sql : str
+            Query to execute
+        network : str, optional
+            Network queried, used to adapt the timeout to the latency of the network
+        query_status : dict, optional
+            Its "error" key is set to the exception of the first failed page of the query
+
+        Returns
+        -------
+        table : pa.Table
+            Table containing the result of the query
+        """
+        if query_status is None:
+            query_status = {"error": None}
+        if not self.CACHED or self.QUERY_CACHE_SIZE == 0:
+            return self.execute_query_no_cache(sql, network, query_status)
+        sql_hash = hashlib.blake2b(sql.encode(), digest_size=16).hexdigest()
+        with self.query_cache_lock:
+            cached = self.query_cache.get(sql_hash)
+            if cached is not None:
+                if time.monotonic() - cached[0] < self.TTL_MINUTES * 60:
+                    self.query_cache.move_to_end(sql_hash)
+                    return cached[1]
+                del self.query_cache[sql_hash]
+
+        table = self.execute_query_no_cache(sql, network, query_status)
+        if query_status.get("error") is None:
+            with self.query_cache_lock:
+                self.query_cache[sql_hash] = (time.monotonic(), table)
+                self.query_cache.move_to_end(sql_hash)
+                while len(self.query_cache) > self.QUERY_CACHE_SIZE:
+                    self.query_cache.popitem(last=False)
+        return table
+
+    def execute_query_no_cache(self, sql, network=None, query_status=None):
+        """
+        Execute the query and return all the pages of the result without looking at the cache
+
+        Pages are concatenated as arrow tables, unifying the types that differ between pages
+        (e.g. a column all null on the first page, or int64 on one page and double on the next one).
+        Parameters
+        ----------
+        sql : str
+            Query to execute
+        network : str, optional
+            Network queried, used to adapt the timeout to the latency of the network
+        query_status : dict, optional
+            Its "error" key is set to the exception of the first failed page of the query
+
+        Returns
+        -------
+        table : pa.Table
+            Table containing the result of the query
+        """
+        table = concat_tables(self.iter_query_pages(sql, network, query_status))
+        if table.num_rows == self.MAX_ROWS:
             print("WARNING: the query is probably not returning all the results, you should decrease the max_address")
-        return df
+        return table
+
+    def iter_query_pages(self, sql, network=None, query_status=None):
+        """
+        Execute the query and yield the pages of the result in order
+
+        The first page is fetched alone so the query id is created and cached by flipside.
+        If it is full the following pages are fetched concurrently against the cached query id, by batches doubling in
+        size until a page is not full. No page is requested above MAX_ROWS since flipside does not return more rows.
+        Only the pages of the current batch are held in memory.
+        If the network is given the timeout is adapted to its latency, measured on the first page which runs the query.
+        A failed page ends the result like an empty page and sets the error of query_status, the callers must not
+        use the truncated result as a complete one.
+        Parameters
+        ----------
+        sql : str
+            Query to execute
+        network : str, optional
+            Network queried
+        query_status : dict, optional
+            Its "error" key is set to the exception of the first failed page
+
+        Yields
+        ------
+        table : pa.Table
+            Page of the result
+        """
+        if query_status is None:
+            query_status = {"error": None}
+        if network is None:
+            timeout_minutes = self.TIMEOUT_MINUTES
+            table, error = self.try_query_page_table(sql, 1)
+        else:
+            timeout_minutes = self.get_timeout_minutes(network)
+            start_time = time.monotonic()
+            table, error = self.try_query_page_table(sql, 1, timeout_minutes)
+            # a query failing before the timeout (e.g. rate limited) says nothing about the latency of the network
+            if error is None:
+                self.update_latency(network, time.monotonic() - start_time)
+            elif isinstance(error, QueryRunTimeoutError):
+                self.update_latency(network, timeout_minutes * 60)
+        if error is not None and query_status.get("error") is None:
+            query_status["error"] = error
+        yield table
+        last_page = -(-self.MAX_ROWS // self.PAGE_SIZE)
+        next_page = 2
+        n_pages = 1
+        if table.num_rows == self.PAGE_SIZE and next_page <= last_page:
+            with ThreadPoolExecutor(max_workers=self.MAX_PAGE_WORKERS) as executor:
+                while table.num_rows == self.PAGE_SIZE and next_page <= last_page:
+                    n_pages = min(n_pages * 2, last_page - next_page + 1)
+                    pages = range(next_page, next_page + n_pages)
+                    for table, error in executor.map(lambda p: self.try_query_page_table(sql, p, timeout_minutes),
+                                                     pages):
+                        if error is not None and query_status.get("error") is None:
+                            query_status["error"] = error
+                        yield table
+                        if table.num_rows < self.PAGE_SIZE:
+                            break
+                    next_page += n_pages
 
     def execute_query_page(self, sql, page_number):
+        return self.execute_query_page_table(sql, page_number).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def get_timeout_minutes(self, network):
+        with self.latency_lock:
+            timeout_minutes = math.ceil(self.latency_ewma[network] / 60 * 3)
+        min_timeout_minutes = max(1, math.ceil(self.TIMEOUT_MINUTES / 2))
+        return min(max(timeout_minutes, min_timeout_minutes), self.TIMEOUT_MINUTES * 2)
+
+    def update_latency(self, network, latency_seconds):
+        with self.latency_lock:
+            self.latency_ewma[network] = 0.8 * self.latency_ewma[network] + 0.2 * latency_seconds
+
+    def execute_query_page_table(self, sql, page_number, timeout_minutes=None):
+        return self.try_query_page_table(sql, page_number, timeout_minutes)[0]
+
+    def try_query_page_table(self, sql, page_number, timeout_minutes=None):
+        """
+        Execute the query and return the page as an arrow table, with the exception raised if the query failed
+
+        Returns
+        -------
+        table : pa.Table
+            Page of the result, an empty table if the query failed
+        error : Exception or None
+            Exception raised by the query
+        """
+        if timeout_minutes is None:
+            timeout_minutes = self.TIMEOUT_MINUTES
         try:
             query_result_set = self.sdk.query(sql,
                                               page_size=self.PAGE_SIZE,
                                               page_number=page_number,
-                                              timeout_minutes=self.TIMEOUT_MINUTES,
+                                              timeout_minutes=timeout_minutes,
                                               ttl_minutes=self.TTL_MINUTES,
                                               cached=self.CACHED,
                                               retry_interval_seconds=self.RETRY_INTERVAL_SECONDS)
@@ -69,245 +398,581 @@ class FlipsideApi(object):
         except Exception as e:
             print(e)
             print(sql)
-            return pd.DataFrame()  # return empty dataframe
-        return pd.DataFrame(query_result_set.records)
+            return pa.table({}), e  # return empty table
+        return records_to_table(query_result_set.records or []), None
+
+    async def extract_transactions(self, extract_dir, array_address, columns=None, min_block_timestamp=None):
+        """
+        Extract the transactions of the addresses on all the networks concurrently
 
-    def extract_transactions(self, extract_dir, array_address):
-        list_network = ["ethereum", "polygon",
-                        "arbitrum", "avalanche", "gnosis", "optimism"]
-        for network in list_network:
-            self.extract_transactions_net(extract_dir, array_address, network)
+        The queries are I/O bound on the Flipside API, each chunk of addresses is run in a thread and
+        at most MAX_CONCURRENT_QUERIES are in flight at the same time across all the networks.
+        Parameters
+        ----------
+        extract_dir : str
+            Directory where to export the files, in the format of EXPORT_FORMAT
+        array_address : numpy.ndarray
+            Array containing the addresses
+        columns : list of str, optional
+            Columns to query, all the columns of the network by default.
+            TX_HASH, BLOCK_TIMESTAMP, FROM_ADDRESS and TO_ADDRESS are always queried.
+            VALUE is the native value column of each network (ETH_VALUE, MATIC_VALUE, ...), gnosis has none.
+        min_block_timestamp : str, optional
+            Only query transactions from this block timestamp, for incremental extracts.
+            The transactions are merged into the files of the previous extract, deduplicated by tx_hash.
+
+        Returns
+        -------
 
-    def extract_transactions_net(self, extract_dir, array_address, network):
+        """
+        list_network = list(TX_TABLES)
+        if columns is not None:
+            # raise before any query runs if the columns do not exist on a network
+            for network in list_network:
+                self.get_network_columns(columns, network)
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_QUERIES)
+        await asyncio.gather(*[self.extract_transactions_net_async(extract_dir, array_address, network, semaphore,
+                                                                   columns, min_block_timestamp)
+                               for network in list_network])
+
+    def extract_transactions_sync(self, extract_dir, array_address, columns=None, min_block_timestamp=None):
+        return asyncio.run(self.extract_transactions(extract_dir, array_address, columns, min_block_timestamp))
+
+    def extract_transactions_net(self, extract_dir, array_address, network, columns=None, min_block_timestamp=None):
+        return asyncio.run(self.extract_transactions_net_async(extract_dir, array_address, network,
+                                                               columns=columns,
+                                                               min_block_timestamp=min_block_timestamp))
+
+    async def extract_transactions_net_async(self, extract_dir, array_address, network, semaphore=None, columns=None,
+                                             min_block_timestamp=None):
         print("Extracting transactions for network: ", network)
+        if columns is not None:
+            self.get_network_columns(columns, network)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_QUERIES)
+        # created once per network, before the chunks write to it concurrently
+        os.makedirs(os.path.join(extract_dir, network), exist_ok=True)
+        if self.EXPORT_FORMAT == "chunk":
+            # the chunk export of this extract starts with a new run id
+            with self.chunk_manifest_lock:
+                self.chunk_manifest.pop((extract_dir, network), None)
+        if columns is not None:
+            upper_columns = [col.upper() for col in columns]
+            columns = [col for col in EXTRACT_COLUMNS if col not in upper_columns] + list(columns)
         len_address = len(array_address)
-        q, r = divmod(len_address, self.MAX_ADDRESS)
-        if r != 0:
-            q += 1
-        for i in range(q):
-            start_index = i * self.MAX_ADDRESS
-            end_index = (i + 1) * self.MAX_ADDRESS
-            print(
-                f"Extracting transactions for address: {start_index} - {end_index}")
-            df = self.get_transactions(
-                array_address[start_index: end_index], network)
-            if df.shape[0] == 0 or df.shape == self.MAX_ROWS:  # retry with smaller query timeout or max rows
-                self.extract_transactions_rec(
-                    array_address, start_index, end_index, network, extract_dir)
-            else:
-                self.export_address(
-                    df, array_address[start_index: end_index], extract_dir, network)
-
-    def get_transactions(self, array_address, network):
-        if network == "ethereum":
-            sql = self.get_eth_transactions_sql_query(array_address)
-        elif network == "polygon":
-            sql = self.get_polygon_transactions_sql_query(array_address)
-        elif network == "arbitrum":
-            sql = self.get_arbitrum_transactions_sql_query(array_address)
-        elif network == "avalanche":
-            sql = self.get_avalanche_transactions_sql_query(array_address)
-        elif network == "gnosis":
-            sql = self.get_gnosis_transactions_sql_query(array_address)
-        elif network == "optimism":
-            sql = self.get_optimism_transactions_sql_query(array_address)
-        else:
-            raise Exception("Network not supported")
+        # The chunk size is adapted with AIMD: it starts at MAX_ADDRESS, is halved when a chunk times out or hits
+        # MAX_ROWS (the chunk itself is bisected) and grows by 25% after 3 chunks in a row succeed,
+        # up to 2 * MAX_ADDRESS
+        # The state is only touched from the event loop so the workers do not need a lock
+        chunking = {"start": 0, "size": self.MAX_ADDRESS, "success_streak": 0}
 
-        df = self.execute_query(sql)
-        return df
+        async def extract_chunks():
+            while chunking["start"] < len_address:
+                async with semaphore:
+                    start_index = chunking["start"]
+                    if start_index >= len_address:
+                        return
+                    end_index = min(start_index + chunking["size"], len_address)
+                    chunking["start"] = end_index
+                    success = await asyncio.to_thread(self.extract_transactions_between_rec,
+                                                      array_address, start_index, end_index, network, extract_dir,
+                                                      columns, min_block_timestamp)
+                if success:
+                    chunking["success_streak"] += 1
+                    if chunking["success_streak"] >= 3:
+                        grown_size = max(int(chunking["size"] * 1.25), chunking["size"] + 1)
+                        chunking["size"] = min(grown_size, self.MAX_ADDRESS * 2)
+                        chunking["success_streak"] = 0
+                else:
+                    chunking["size"] = max(chunking["size"] // 2, 1)
+                    chunking["success_streak"] = 0
 
-    @staticmethod
-    def export_address(df, np_address, extract_dir, network):
+        await asyncio.gather(*[extract_chunks() for _ in range(self.MAX_CONCURRENT_QUERIES)])
+        if self.EXPORT_FORMAT == "chunk":
+            self.write_manifest(extract_dir, network, min_block_timestamp)
+
+    def get_transactions(self, array_address, network, columns=None, min_block_timestamp=None):
+        return self.get_transactions_table(array_address, network, columns,
+                                           min_block_timestamp).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def get_transactions_table(self, array_address, network, columns=None, min_block_timestamp=None,
+                               use_query_cache=True, query_status=None):
+        sql = self.get_transactions_sql_query(array_address, network, columns=columns,
+                                              min_block_timestamp=min_block_timestamp)
+        if not use_query_cache:
+            return self.execute_query_no_cache(sql, network, query_status)
+        return self.execute_query_table(sql, network, query_status)
+
+    @classmethod
+    def export_address(cls, df, np_address, extract_dir, network, export_format="parquet", append=False):
         """
-        Export the dataframe to a csv file
+        Export the dataframe to a parquet or csv file per address
 
         Change the idea and exporting straight to an account based csv for easier csv manipulation from other tools
         If there is no transactions them the file is not created, creating empty file is useless.
+        The dataframe is scanned once for all the addresses and then grouped by address.
+        The files are written concurrently by EXPORT_EXECUTOR, the method returns once all of them are written.
+        The network directory must exist, extract_transactions_net creates it.
+        Parquet is the default, it is faster to write and smaller on disk than csv.
         Parameters
         ----------
-        df : pd.DataFrame
-            Dataframe containing the transactions of potentially many addresses
+        df : pa.Table or pd.DataFrame
+            Transactions of potentially many addresses, a dataframe is converted to an arrow table
         np_address : numpy.ndarray
             Array containing the addresses
         extract_dir : str
-            Directory where to export the csv file
+            Directory where to export the files
         network : str
             Network of the transactions
+        export_format : str
+            "parquet" or "csv"
+        append : bool
+            Merge the transactions into the existing files instead of overwriting them, for incremental extracts
+
+        Returns
+        -------
+
+        """
+        table = to_arrow_table(df)
+        cats, from_code, to_code = cls.get_address_codes(table, np_address)
+        # explode the transactions to (address, row) pairs once instead of scanning the table for each address
+        idx = np.concatenate([np.arange(table.num_rows), np.arange(table.num_rows)])
+        codes = np.concatenate([from_code, to_code])
+        mask = codes >= 0
+        pairs = pd.DataFrame({'a': codes[mask], 'i': idx[mask]})
+        if export_format == "parquet":
+            save_file, read_file = save_parquet, read_parquet
+        elif export_format == "csv":
+            save_file, read_file = save_csv, read_csv
+        else:
+            raise Exception("Export format not supported")
+        if pairs.shape[0] == 0:
+            return
+        path_to_export = os.path.join(extract_dir, network)
+        futures = []
+        # address -> positions in pairs, built once so each address is a single take on the table
+        address_indices = pairs.groupby('a', sort=False).indices
+        pairs_row = pairs['i'].values
+        for code, indices in address_indices.items():
+            address = cats[code]
+            file_path = os.path.join(path_to_export, f"{address}_tx.{export_format}")
+            # np.unique sorts the rows back in their original order and drops self transactions counted twice
+            address_table = table.take(pa.array(np.unique(pairs_row[indices])))
+            if append:
+                futures.append(cls.EXPORT_EXECUTOR.submit(
+                    save_merged, save_file, read_file, address_table, path_to_export, file_path))
+            else:
+                futures.append(cls.EXPORT_EXECUTOR.submit(save_file, address_table, path_to_export, file_path))
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def get_address_codes(table, np_address):
+        """
+        Encode the from and to addresses of the transactions as int32 codes of np_address
+
+        Parameters
+        ----------
+        table : pa.Table
+            Transactions with from_address and to_address columns
+        np_address : numpy.ndarray
+            Array containing the addresses
 
         Returns
         -------
+        cats : pd.Index
+            Lower case addresses, the code of an address is its position
+        from_code : numpy.ndarray
+            Code of the from address of each transaction, -1 if it is not in np_address
+        to_code : numpy.ndarray
+            Code of the to address of each transaction, -1 if it is not in np_address
+        """
+        # flipside returns lower case addresses, each address is encoded once as an int32 code (-1 if not queried)
+        # the addresses are lowercased and deduplicated once in a set, without going through the pandas str methods
+        addr_set = frozenset(address.lower() for address in np_address)
+        cats = pd.Index(np.asarray(list(addr_set), dtype=object))
+        value_set = pa.array(cats.values, type=pa.string())
+        from_code = pc.index_in(lower_address(table["from_address"]), value_set=value_set)
+        to_code = pc.index_in(lower_address(table["to_address"]), value_set=value_set)
+        return (cats,
+                from_code.fill_null(-1).to_numpy().astype(np.int32),
+                to_code.fill_null(-1).to_numpy().astype(np.int32))
 
+    @classmethod
+    def export_chunk(cls, df, np_address, extract_dir, network, chunk_file):
         """
-        for address in np_address:
-            df_address_transactions = df[np.logical_or(
-                df.from_address == address, df.to_address == address)]
+        Export all the transactions of a query to a single parquet file
+
+        A transaction between two addresses of the chunk is written once instead of once per address.
+        Parameters
+        ----------
+        df : pa.Table or pd.DataFrame
+            Transactions of potentially many addresses
+        np_address : numpy.ndarray
+            Array containing the addresses
+        extract_dir : str
+            Directory where to export the file
+        network : str
+            Network of the transactions
+        chunk_file : str
+            Name of the parquet file
+
+        Returns
+        -------
+        addresses : pd.Index
+            Addresses of np_address having transactions in the file
+        """
+        table = to_arrow_table(df)
+        cats, from_code, to_code = cls.get_address_codes(table, np_address)
+        codes = np.unique(np.concatenate([from_code, to_code]))
+        addresses = cats[codes[codes >= 0]]
+        if addresses.shape[0] > 0:
             path_to_export = os.path.join(extract_dir, network)
-            csv_file = os.path.join(path_to_export, f"{address}_tx.csv")
-            if df_address_transactions.shape[0] > 0:
-                save_csv(df_address_transactions, path_to_export, csv_file)
-            # else:
-            #     print(f"No transactions found for address {address}")
+            save_parquet(table, path_to_export, os.path.join(path_to_export, chunk_file))
+        return addresses
+
+    def export_transactions(self, table, array_address, start_index, end_index, network, extract_dir, append=False):
+        np_address = array_address[start_index: end_index]
+        if self.EXPORT_FORMAT != "chunk":
+            self.export_address(table, np_address, extract_dir, network, self.EXPORT_FORMAT, append)
+            return
+        chunk_file = self.get_chunk_file(extract_dir, network, start_index, end_index)
+        addresses = self.export_chunk(table, np_address, extract_dir, network, chunk_file)
+        self.add_manifest_entries(extract_dir, network, [(address, chunk_file) for address in addresses], np_address)
+
+    def get_chunk_run(self, extract_dir, network):
+        # called with chunk_manifest_lock held, starts a run if the export is not part of extract_transactions_net
+        return self.chunk_manifest.setdefault((extract_dir, network), {
+            "run_id": uuid.uuid4().hex[:12], "entries": [], "covered_addresses": set(), "failed": False})
+
+    def get_chunk_file(self, extract_dir, network, start_index, end_index, part=0):
+        with self.chunk_manifest_lock:
+            run_id = self.get_chunk_run(extract_dir, network)["run_id"]
+        string_part = f"_{part}" if part else ""
+        return f"chunk_{run_id}_{start_index}_{end_index}{string_part}.parquet"
+
+    def add_manifest_entries(self, extract_dir, network, entries, covered_addresses):
+        # covered_addresses are the queried addresses, with or without transactions, their previous entries are replaced
+        with self.chunk_manifest_lock:
+            chunk_run = self.get_chunk_run(extract_dir, network)
+            chunk_run["entries"].extend(entries)
+            chunk_run["covered_addresses"].update(address.lower() for address in covered_addresses)
+
+    def report_failed_slice(self, extract_dir, network, message):
+        print(f"WARNING: {message}, the transactions are not exported")
+        if self.EXPORT_FORMAT == "chunk":
+            with self.chunk_manifest_lock:
+                self.get_chunk_run(extract_dir, network)["failed"] = True
+
+    def stream_transactions_chunk(self, array_address, start_index, end_index, network, extract_dir, columns=None,
+                                  min_block_timestamp=None, query_status=None):
+        """
+        Query the transactions of array_address[start_index: end_index] and stream the pages to the chunk file
+
+        The pages are written with a pq.ParquetWriter as they arrive so the whole result is never held in memory.
+        A page whose schema can not be cast to the schema of the file (e.g. a value column typed int64 on the first
+        page and double on the next one) starts a new part file.
+        If a page failed or the result reaches MAX_ROWS the files are removed and nothing is added to the manifest,
+        the caller retries. The "error" key of query_status is set to the exception of the first failed page.
+
+        Returns
+        -------
+        n_rows : int
+            Number of transactions returned by the query
+        """
+        np_address = array_address[start_index: end_index]
+        sql = self.get_transactions_sql_query(np_address, network, columns=columns,
+                                              min_block_timestamp=min_block_timestamp)
+        path_to_export = os.path.join(extract_dir, network)
+        n_rows = 0
+        chunk_files = []
+        addresses = set()
+        writer = None
+        if query_status is None:
+            query_status = {"error": None}
+        try:
+            for table in self.iter_query_pages(sql, network, query_status):
+                if table.num_rows == 0:
+                    continue
+                if writer is not None and table.schema != writer.schema:
+                    try:
+                        table = table.cast(writer.schema)
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError):
+                        writer.close()
+                        writer = None
+                if writer is None:
+                    chunk_files.append(self.get_chunk_file(extract_dir, network, start_index, end_index,
+                                                           len(chunk_files)))
+                    writer = pq.ParquetWriter(os.path.join(path_to_export, chunk_files[-1]), table.schema,
+                                              compression='zstd')
+                writer.write_table(table)
+                n_rows += table.num_rows
+                cats, from_code, to_code = self.get_address_codes(table, np_address)
+                codes = np.unique(np.concatenate([from_code, to_code]))
+                addresses.update(cats[codes[codes >= 0]])
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if query_status.get("error") is not None or n_rows >= self.MAX_ROWS:
+            for chunk_file in chunk_files:
+                os.remove(os.path.join(path_to_export, chunk_file))
+            return n_rows
+        self.add_manifest_entries(extract_dir, network,
+                                  [(address, chunk_file) for address in addresses for chunk_file in chunk_files],
+                                  np_address)
+        return n_rows
+
+    def write_manifest(self, extract_dir, network, min_block_timestamp=None):
+        """
+        Write the address -> chunk file manifest of the network, merged with the manifest of a previous extract
+
+        The addresses whose query succeeded replace their entries of the previous manifest, unless the extract is
+        incremental (min_block_timestamp is given) in which case the new files are added to the previous ones.
+        The addresses of failed slices keep their previous entries.
+        If no slice failed, the chunk files no address points to anymore are removed.
+        """
+        with self.chunk_manifest_lock:
+            self.get_chunk_run(extract_dir, network)
+            chunk_run = self.chunk_manifest.pop((extract_dir, network))
+        df_manifest = pd.DataFrame(chunk_run["entries"], columns=["address", "file"])
+        manifest_path = os.path.join(extract_dir, network, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            df_previous = pd.read_parquet(manifest_path)
+            previous_files = set(df_previous.file)
+            if min_block_timestamp is None:
+                df_previous = df_previous[~df_previous.address.isin(chunk_run["covered_addresses"])]
+            df_manifest = pd.concat([df_previous, df_manifest], ignore_index=True).drop_duplicates()
+            unreferenced_files = set() if chunk_run["failed"] else previous_files.difference(df_manifest.file)
+            for file in unreferenced_files:
+                file_path = os.path.join(extract_dir, network, file)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        df_manifest.to_parquet(manifest_path, index=False)
+
+    @staticmethod
+    def load_address_transactions(extract_dir, network, address):
+        """
+        Load the transactions of an address exported with export_format="chunk"
+
+        Only the chunk files listed for the address in the manifest are read, filtered on the address.
+        Transactions found in several files (e.g. after an incremental extract) are returned once.
+        Parameters
+        ----------
+        extract_dir : str
+            Directory of the extract
+        network : str
+            Network of the transactions
+        address : str
+            Address to load
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe containing the transactions of the address
+        """
+        path_to_network = os.path.join(extract_dir, network)
+        address = address.lower()
+        df_manifest = pd.read_parquet(os.path.join(path_to_network, MANIFEST_FILE),
+                                      filters=[("address", "==", address)])
+        filters = [[("from_address", "==", address)], [("to_address", "==", address)]]
+        list_df = [pd.read_parquet(os.path.join(path_to_network, file), filters=filters)
+                   for file in df_manifest.file.unique()]
+        if len(list_df) == 0:
+            return pd.DataFrame()
+        return pd.concat(list_df, ignore_index=True).drop_duplicates(subset="tx_hash", ignore_index=True)
 
-    def extract_transactions_rec(self, array_address, start_index, end_index, network, extract_dir):
+    def extract_transactions_rec(self, array_address, start_index, end_index, network, extract_dir, columns=None,
+                                 min_block_timestamp=None):
         end_first_slice = (start_index + end_index) // 2
         print("Retrying with smaller query")
         self.extract_transactions_between_rec(
-            array_address, start_index, end_first_slice, network, extract_dir)
+            array_address, start_index, end_first_slice, network, extract_dir, columns, min_block_timestamp)
         self.extract_transactions_between_rec(
-            array_address, end_first_slice, end_index, network, extract_dir)
+            array_address, end_first_slice, end_index, network, extract_dir, columns, min_block_timestamp)
 
-    def extract_transactions_between_rec(self, array_address, start_index, end_index, network, extract_dir):
+    def extract_transactions_between_rec(self, array_address, start_index, end_index, network, extract_dir,
+                                         columns=None, min_block_timestamp=None):
+        """
+        Extract and export the transactions of array_address[start_index: end_index]
+
+        The slice is bisected recursively if the query times out or returns MAX_ROWS.
+        A query failing for another reason is retried QUERY_RETRIES times as is, then the slice is not exported.
+        Returns True if the first query of the slice succeeded, even without transactions, False otherwise.
+        """
         print(
             f"Extracting transactions for address: {start_index} - {end_index}")
-        df = self.get_transactions(array_address[start_index: end_index], network)
-        if df.shape[0] == 0:
-            # recursive call
-            print("Retrying with smaller query")
-            self.extract_transactions_rec(
-                array_address, start_index, end_index, network, extract_dir)
+        for _ in range(self.QUERY_RETRIES + 1):
+            query_status = {"error": None}
+            if self.EXPORT_FORMAT == "chunk":
+                # the pages are written as they arrive, there is nothing left to export
+                table = None
+                n_rows = self.stream_transactions_chunk(array_address, start_index, end_index, network, extract_dir,
+                                                        columns, min_block_timestamp, query_status)
+            else:
+                # the sql of each slice is only run once, the query cache would only hold large results in memory
+                table = self.get_transactions_table(array_address[start_index: end_index], network, columns,
+                                                    min_block_timestamp, use_query_cache=False,
+                                                    query_status=query_status)
+                n_rows = table.num_rows
+            error = query_status["error"]
+            if error is None or isinstance(error, QueryRunTimeoutError):
+                break
+            print(f"Retrying failed query for address: {start_index} - {end_index}")
+            time.sleep(self.RETRY_INTERVAL_SECONDS)
         else:
-            self.export_address(
-                df, array_address[start_index: end_index], extract_dir, network)
+            self.report_failed_slice(extract_dir, network, f"query failed for address: {start_index} - {end_index}")
+            return False
+        if error is not None or n_rows >= self.MAX_ROWS:  # retry with smaller query timeout or max rows
+            if end_index - start_index > 1:
+                # recursive call
+                self.extract_transactions_rec(
+                    array_address, start_index, end_index, network, extract_dir, columns, min_block_timestamp)
+                return False
+            if error is not None:
+                self.report_failed_slice(extract_dir, network,
+                                         f"query timed out for address {array_address[start_index]}")
+                return False
+            # a single address with more than MAX_ROWS transactions can not be split, page through time instead
+            query_status = {"error": None}
+            table = self.get_transactions_by_time(array_address[start_index], network, columns, min_block_timestamp,
+                                                  query_status)
+            if query_status["error"] is not None:
+                self.report_failed_slice(extract_dir, network,
+                                         f"query failed for address {array_address[start_index]}")
+                return False
+            if table.num_rows > 0:
+                self.export_transactions(table, array_address, start_index, end_index, network, extract_dir,
+                                         min_block_timestamp is not None)
+            return False
+        if n_rows == 0:
+            print(f"No transactions found for address: {start_index} - {end_index}")
+        elif table is not None:
+            self.export_transactions(table, array_address, start_index, end_index, network, extract_dir,
+                                     min_block_timestamp is not None)
+        return True
+
+    def get_transactions_by_time(self, address, network, columns=None, min_block_timestamp=None, query_status=None):
+        """
+        Get all the transactions of a single address by querying consecutive block timestamp ranges
+
+        Each query is ordered by block timestamp and limited to MAX_ROWS, the next one starts at the last
+        block timestamp returned. Transactions of the boundary timestamp are returned twice and dropped by tx_hash.
+        Parameters
+        ----------
+        address : str
+            Address to query
+        network : str
+            Network of the transactions
+        columns : list of str, optional
+            Columns to query, they must include TX_HASH and BLOCK_TIMESTAMP
+        min_block_timestamp : str, optional
+            Block timestamp of the first query
+        query_status : dict, optional
+            Its "error" key is set to the exception of the first failed query
+
+        Returns
+        -------
+        table : pa.Table
+            Table containing the transactions of the address, up to the first failed query
+        """
+        if query_status is None:
+            query_status = {"error": None}
+        list_tables = []
+        while True:
+            print(f"Extracting transactions for address {address} from {min_block_timestamp}")
+            sql = self.get_transactions_sql_query([address], network, limit=self.MAX_ROWS, columns=columns,
+                                                  min_block_timestamp=min_block_timestamp, order_by_time=True)
+            table = self.execute_query_no_cache(sql, network, query_status)
+            if query_status.get("error") is not None:
+                # a failed page ends the result early, the transactions after min_block_timestamp are missing
+                n_rows = sum(previous_table.num_rows for previous_table in list_tables)
+                print(f"WARNING: query failed for address {address} from {min_block_timestamp}, "
+                      f"only {n_rows} transactions extracted")
+                break
+            list_tables.append(table)
+            if table.num_rows < self.MAX_ROWS:
+                break
+            last_block_timestamp = str(pc.max(table["block_timestamp"]).as_py())
+            if last_block_timestamp == min_block_timestamp:
+                break
+            min_block_timestamp = last_block_timestamp
+        table = concat_tables(list_tables)
+        if table.num_rows == 0:
+            return table
+        return drop_duplicate_tx(table)
+
+    @staticmethod
+    def get_network_columns(columns, network):
+        """
+        Resolve the VALUE column to the native value column of the network, it is dropped on gnosis which has none
+
+        Raises an exception if a column is the native value column of another network, the query would fail.
+        """
+        if network not in TX_TABLES:
+            raise Exception("Network not supported")
+        value_column = TX_TABLES[network][1]
+        other_value_columns = {other_value_column for table, other_value_column in TX_TABLES.values()
+                               if other_value_column is not None and other_value_column != value_column}
+        network_columns = []
+        for column in columns:
+            if column.upper() == "VALUE":
+                if value_column is not None:
+                    network_columns.append(value_column)
+            elif column.upper() in other_value_columns:
+                raise Exception(f"Column {column} does not exist on {network}, use VALUE for the native value column")
+            else:
+                network_columns.append(column)
+        return network_columns
 
     @staticmethod
     def get_string_address(array_address):
-        lower_str = ""
-        for add in array_address:
-            lower_str += f'LOWER(\'{add}\'),'
-        lower_str = lower_str[:-1]
-        return lower_str
+        return ",".join(f'LOWER(\'{add}\')' for add in array_address)
 
-    def get_eth_transactions_sql_query(self, array_address, limit=0):
-        str_list_add = self.get_string_address(array_address)
-        if limit != 0:
-            string_limit = f"LIMIT {limit}"
+    def get_transactions_sql_query(self, array_address, network, limit=0, columns=None, min_block_timestamp=None,
+                                   order_by_time=False):
+        if network not in self.TX_SQL_TEMPLATES:
+            raise Exception("Network not supported")
+        if columns is None:
+            string_columns = self.TX_DEFAULT_COLUMNS[network]
         else:
-            string_limit = ""
-        sql = f"""
-                SELECT TX_HASH,
-                BLOCK_TIMESTAMP,
-                FROM_ADDRESS,
-                TO_ADDRESS,
-                GAS_LIMIT,
-                GAS_USED,
-                TX_FEE,
-                ETH_VALUE
-                FROM ethereum.core.fact_transactions
-                WHERE FROM_ADDRESS IN ({str_list_add})
-                OR TO_ADDRESS IN ({str_list_add})
-                {string_limit};
-                """
-        return sql
-
-    def get_polygon_transactions_sql_query(self, array_address, limit=0):
-        str_list_add = self.get_string_address(array_address)
+            string_columns = ", ".join(self.get_network_columns(columns, network))
         if limit != 0:
             string_limit = f"LIMIT {limit}"
         else:
             string_limit = ""
-        sql = f"""
-                SELECT TX_HASH,
-                BLOCK_TIMESTAMP,
-                FROM_ADDRESS,
-                TO_ADDRESS,
-                GAS_LIMIT,
-                GAS_USED,
-                TX_FEE,
-                MATIC_VALUE
-                FROM polygon.core.fact_transactions
-                WHERE FROM_ADDRESS IN ({str_list_add})
-                OR TO_ADDRESS IN ({str_list_add})
-                {string_limit};
-                """
-        return sql
-
-    def get_arbitrum_transactions_sql_query(self, array_address, limit=0):
-        str_list_add = self.get_string_address(array_address)
-        if limit != 0:
-            string_limit = f"LIMIT {limit}"
+        # AND binds tighter than OR so the filter is repeated on both sides of the OR
+        if min_block_timestamp is not None:
+            string_filter = f" AND BLOCK_TIMESTAMP >= '{min_block_timestamp}'"
         else:
-            string_limit = ""
-        sql = f"""
-                SELECT TX_HASH,
-                BLOCK_TIMESTAMP,
-                FROM_ADDRESS,
-                TO_ADDRESS,
-                GAS_LIMIT,
-                GAS_USED,
-                TX_FEE,
-                ETH_VALUE
-                FROM arbitrum.core.fact_transactions
-                WHERE FROM_ADDRESS IN ({str_list_add})
-                OR TO_ADDRESS IN ({str_list_add})
-                {string_limit};
-                """
-        return sql
-
-    def get_avalanche_transactions_sql_query(self, array_address, limit=0):
-        str_list_add = self.get_string_address(array_address)
-        if limit != 0:
-            string_limit = f"LIMIT {limit}"
+            string_filter = ""
+        if order_by_time:
+            string_order = " ORDER BY BLOCK_TIMESTAMP"
         else:
-            string_limit = ""
-        sql = f"""
-                SELECT TX_HASH,
-                BLOCK_TIMESTAMP,
-                FROM_ADDRESS,
-                TO_ADDRESS,
-                GAS_LIMIT,
-                GAS_USED,
-                TX_FEE,
-                AVAX_VALUE
-                FROM avalanche.core.fact_transactions
-                WHERE FROM_ADDRESS IN ({str_list_add})
-                OR TO_ADDRESS IN ({str_list_add})
-                {string_limit};
-                """
-        return sql
+            string_order = ""
+        return self.TX_SQL_TEMPLATES[network].format(columns=string_columns,
+                                                     addrs=self.get_string_address(array_address),
+                                                     filter=string_filter,
+                                                     order=string_order,
+                                                     limit=string_limit)
 
-    def get_gnosis_transactions_sql_query(self, array_address, limit=0):
-        str_list_add = self.get_string_address(array_address)
-        if limit != 0:
-            string_limit = f"LIMIT {limit}"
-        else:
-            string_limit = ""
-        sql = f"""
-                    SELECT TX_HASH,
-                    BLOCK_TIMESTAMP,
-                    FROM_ADDRESS,
-                    TO_ADDRESS,
-                    GAS_LIMIT,
-                    GAS_USED,
-                    TX_FEE
-                    FROM gnosis.core.fact_transactions
-                    WHERE FROM_ADDRESS IN ({str_list_add})
-                    OR TO_ADDRESS IN ({str_list_add})
-                    {string_limit};
-                    """
-        return sql
+    def get_eth_transactions_sql_query(self, array_address, limit=0, columns=None, min_block_timestamp=None):
+        return self.get_transactions_sql_query(array_address, "ethereum", limit, columns, min_block_timestamp)
 
-    def get_optimism_transactions_sql_query(self, array_address, limit=0):
-        str_list_add = self.get_string_address(array_address)
-        if limit != 0:
-            string_limit = f"LIMIT {limit}"
-        else:
-            string_limit = ""
-        sql = f"""
-                    SELECT TX_HASH,
-                    BLOCK_TIMESTAMP,
-                    FROM_ADDRESS,
-                    TO_ADDRESS,
-                    GAS_LIMIT,
-                    GAS_USED,
-                    TX_FEE,
-                    ETH_VALUE
-                    FROM optimism.core.fact_transactions
-                    WHERE FROM_ADDRESS IN ({str_list_add})
-                    OR TO_ADDRESS IN ({str_list_add})
-                    {string_limit};
-                    """
-        return sql
+    def get_polygon_transactions_sql_query(self, array_address, limit=0, columns=None, min_block_timestamp=None):
+        return self.get_transactions_sql_query(array_address, "polygon", limit, columns, min_block_timestamp)
+
+    def get_arbitrum_transactions_sql_query(self, array_address, limit=0, columns=None, min_block_timestamp=None):
+        return self.get_transactions_sql_query(array_address, "arbitrum", limit, columns, min_block_timestamp)
+
+    def get_avalanche_transactions_sql_query(self, array_address, limit=0, columns=None, min_block_timestamp=None):
+        return self.get_transactions_sql_query(array_address, "avalanche", limit, columns, min_block_timestamp)
+
+    def get_gnosis_transactions_sql_query(self, array_address, limit=0, columns=None, min_block_timestamp=None):
+        return self.get_transactions_sql_query(array_address, "gnosis", limit, columns, min_block_timestamp)
+
+    def get_optimism_transactions_sql_query(self, array_address, limit=0, columns=None, min_block_timestamp=None):
+        return self.get_transactions_sql_query(array_address, "optimism", limit, columns, min_block_timestamp)
 
     def get_cross_chain_info_sql_query(self, array_address, info_type="label", limit=0):
         str_list_add = self.get_string_address(array_address)
@@ -45,7 +45,10 @@ class LoadData(object):
         path_dir = os.path.join(self.path_to_tx_dir, tx_chain)
         full_path = os.path.join(path_dir, file_name)
         try:
-            df = pd.read_csv(full_path)
+            if file_name.endswith(".parquet"):
+                df = pd.read_parquet(full_path)
+            else:
+                df = pd.read_csv(full_path)
         except Exception as e:
             print(e)
             print("Error reading file: {}".format(full_path))
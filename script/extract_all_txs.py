@@ -20,6 +20,6 @@ list_unique_address = df_address.address.unique()
 
 flipside_api = FlipsideApi(api_key, max_address=1000)
 print("Start mining transactions")
-flipside_api.extract_transactions(PATH_TO_EXPORT, list_unique_address)
+flipside_api.extract_transactions_sync(PATH_TO_EXPORT, list_unique_address)
 
 print("End mining transactions")
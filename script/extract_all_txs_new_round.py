@@ -19,6 +19,6 @@ df_address = pd.read_csv(PATH_TO_ADDRESS)
 list_unique_address = df_address.address.unique()
 
 flipside_api = FlipsideApi(api_key, max_address=1000)
-flipside_api.extract_transactions(PATH_TO_EXPORT, list_unique_address)
+flipside_api.extract_transactions_sync(PATH_TO_EXPORT, list_unique_address)
 
 print("End mining transactions")
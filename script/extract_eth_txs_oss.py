@@ -19,7 +19,7 @@ PATH_TO_EXPORT = "../../data/transactions/OSS"
 df_address = pd.read_csv(PATH_TO_ADDRESS)
 list_unique_address = df_address.address.unique()
 
-flipside_api.extract_transactions(PATH_TO_EXPORT, list_unique_address)
+flipside_api.extract_transactions_sync(PATH_TO_EXPORT, list_unique_address)
 # flipside_api.extract_transactions_net(PATH_TO_EXPORT, list_unique_address, 'ethereum')
 # flipside_api.extract_transactions_net(PATH_TO_EXPORT, list_unique_address, 'polygon')
 # flipside_api.extract_transactions_net(PATH_TO_EXPORT, list_unique_address, 'avalanche')
@@ -1,11 +1,18 @@
 import os
+import re
 import sys
+import tempfile
 import unittest
 from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from shroomdk.errors import QueryRunTimeoutError
 
-from sbscorer.flipside.FlipsideApi import FlipsideApi
+from sbscorer.flipside.FlipsideApi import FlipsideApi, concat_tables, records_to_table
 
 absolute_path = os.fspath(Path.cwd().parent)
 if absolute_path not in sys.path:
@@ -32,6 +39,24 @@ class FlipsideApiTest(unittest.TestCase):
     df_test_address_large = pd.read_csv(os.path.join(PATH_TO_TEST_ADDRESS, TEST_CSV_ADD_LARGE))
     test_address_large = df_test_address_large.address.values[:900]
 
+    @staticmethod
+    def get_offline_sdk(records, fail=None, error=None):
+        # answers the transactions queries from records, filtered on the addresses and block timestamp of the sql
+        # the queries for which fail(sql, page_number) is True raise error
+        def query(sql, page_size, page_number, **kwargs):
+            if fail is not None and fail(sql, page_number):
+                raise error if error is not None else ConnectionError("429 Too Many Requests")
+            addresses = {address.lower() for address in re.findall(r"'(0x[0-9a-fA-F]+)'", sql)}
+            min_block_timestamp = re.search(r"BLOCK_TIMESTAMP >= '([^']+)'", sql)
+            rows = [record for record in records
+                    if (record["from_address"] in addresses or record["to_address"] in addresses)
+                    and (min_block_timestamp is None or record["block_timestamp"] >= min_block_timestamp.group(1))]
+            return SimpleNamespace(records=rows[(page_number - 1) * page_size: page_number * page_size])
+
+        sdk = mock.Mock()
+        sdk.query.side_effect = query
+        return sdk
+
     def test_get_string_address(self):
         string_add = self.flipside_api.get_string_address(
             self.list_unique_address)
@@ -44,6 +69,106 @@ class FlipsideApiTest(unittest.TestCase):
         expected = 'WHERE FROM_ADDRESS IN (LOWER(\'0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82\'),LOWER(\'0x9be7d88cfd6e4b519cd9720db6de6e6f2c1ca77e\'),LOWER(\'0xf8bde71eb161bd83da88bd3a1003eef9ba0c7485\'),LOWER(\'0x1994bc4f630a373ffc3ecef84165cfb85e7f7820\'),LOWER(\'0x13ef1086cdfecc00e0f8f3b2ac2c600f297dc333\'),LOWER(\'0xb324b8ab8634a6c160361d34e672cec739ac55cd\'),LOWER(\'0x1b7a0da1d9c63d9b8209fa5ce98ac0d148960800\'),LOWER(\'0xe718bb18d8176659606b3d7d3f705906a9d3e1bd\'))'
         self.assertTrue(expected in sql)
 
+    def test_get_transactions_sql_query_filter(self):
+        sql = self.flipside_api.get_transactions_sql_query(
+            ["0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82"], "ethereum", limit=10,
+            columns=["TX_HASH", "BLOCK_TIMESTAMP"], min_block_timestamp="2022-01-20", order_by_time=True)
+        expected = 'SELECT TX_HASH, BLOCK_TIMESTAMP FROM ethereum.core.fact_transactions ' \
+                   'WHERE FROM_ADDRESS IN (LOWER(\'0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82\')) ' \
+                   'AND BLOCK_TIMESTAMP >= \'2022-01-20\' ' \
+                   'OR TO_ADDRESS IN (LOWER(\'0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82\')) ' \
+                   'AND BLOCK_TIMESTAMP >= \'2022-01-20\' ORDER BY BLOCK_TIMESTAMP LIMIT 10;'
+        self.assertEqual(expected, sql)
+
+    def test_get_transactions_sql_query_value_column(self):
+        for network, expected in [("ethereum", "SELECT TX_HASH, ETH_VALUE FROM "),
+                                  ("polygon", "SELECT TX_HASH, MATIC_VALUE FROM "),
+                                  ("gnosis", "SELECT TX_HASH FROM ")]:
+            sql = self.flipside_api.get_transactions_sql_query(self.list_unique_address, network,
+                                                               columns=["TX_HASH", "VALUE"])
+            self.assertTrue(sql.startswith(expected))
+        with self.assertRaises(Exception):
+            self.flipside_api.get_transactions_sql_query(self.list_unique_address, "polygon",
+                                                         columns=["TX_HASH", "ETH_VALUE"])
+
+    def test_invalid_export_format(self):
+        with self.assertRaises(Exception):
+            FlipsideApi(self.api_key, export_format="Parquet")
+
+    def test_extract_tx_invalid_columns(self):
+        flipside_api = FlipsideApi(self.api_key)
+        flipside_api.sdk = self.get_offline_sdk([])
+        with tempfile.TemporaryDirectory() as extract_dir:
+            with self.assertRaises(Exception):
+                flipside_api.extract_transactions_sync(extract_dir, self.list_unique_address, columns=["ETH_VALUE"])
+        self.assertEqual(0, flipside_api.sdk.query.call_count)
+
+    def test_get_gnosis_transactions_sql_query_columns(self):
+        sql = self.flipside_api.get_gnosis_transactions_sql_query(self.list_unique_address)
+        self.assertTrue(sql.startswith(
+            'SELECT TX_HASH, BLOCK_TIMESTAMP, FROM_ADDRESS, TO_ADDRESS, GAS_LIMIT, GAS_USED, TX_FEE FROM '))
+
+    def test_get_address_codes(self):
+        table = pa.Table.from_pylist([
+            {"from_address": "0xab", "to_address": "0xcd"},
+            {"from_address": "0xcd", "to_address": None},
+            {"from_address": "0xef", "to_address": "0xAB"}])
+        cats, from_code, to_code = FlipsideApi.get_address_codes(table, np.array(["0xAB", "0xcd"]))
+        self.assertEqual(["0xab", "0xcd", None], [cats[code] if code >= 0 else None for code in from_code])
+        self.assertEqual(["0xcd", None, "0xab"], [cats[code] if code >= 0 else None for code in to_code])
+
+    def test_export_address(self):
+        address_a = "0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82"
+        address_b = "0x9be7d88cfd6e4b519cd9720db6de6e6f2c1ca77e"
+        table = pa.Table.from_pylist([
+            {"tx_hash": "0x1", "from_address": address_a, "to_address": address_b},
+            {"tx_hash": "0x2", "from_address": address_a, "to_address": address_a},
+            {"tx_hash": "0x3", "from_address": "0xa", "to_address": address_b},
+            {"tx_hash": "0x4", "from_address": "0xa", "to_address": "0xb"}])
+        with tempfile.TemporaryDirectory() as extract_dir:
+            os.makedirs(os.path.join(extract_dir, "ethereum"))
+            FlipsideApi.export_address(table, np.array([address_a, address_b.upper()]), extract_dir, "ethereum")
+            path_to_network = os.path.join(extract_dir, "ethereum")
+            self.assertEqual(sorted([f"{address_a}_tx.parquet", f"{address_b}_tx.parquet"]),
+                             sorted(os.listdir(path_to_network)))
+            df_a = pd.read_parquet(os.path.join(path_to_network, f"{address_a}_tx.parquet"))
+            df_b = pd.read_parquet(os.path.join(path_to_network, f"{address_b}_tx.parquet"))
+            self.assertEqual(["0x1", "0x2"], list(df_a.tx_hash))
+            self.assertEqual(["0x1", "0x3"], list(df_b.tx_hash))
+
+    def test_export_address_append(self):
+        address = "0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82"
+        table = pa.Table.from_pylist([
+            {"tx_hash": "0x1", "block_timestamp": "2022-01-01", "from_address": address, "to_address": "0xa",
+             "eth_value": 0.5},
+            {"tx_hash": "0x2", "block_timestamp": "2022-01-20", "from_address": "0xa", "to_address": address,
+             "eth_value": 1.5}])
+        # eth_value inferred as int64 from whole numbers
+        table_incremental = pa.Table.from_pylist([
+            {"tx_hash": "0x2", "block_timestamp": "2022-01-20", "from_address": "0xa", "to_address": address,
+             "eth_value": 1},
+            {"tx_hash": "0x3", "block_timestamp": "2022-01-21", "from_address": address, "to_address": "0xa",
+             "eth_value": 2}])
+        # to_address all null (contract creations) so typed null
+        table_incremental_null = pa.Table.from_pylist([
+            {"tx_hash": "0x4", "block_timestamp": "2022-01-22", "from_address": address, "to_address": None,
+             "eth_value": 0.0}])
+        for export_format in ["parquet", "csv"]:
+            with tempfile.TemporaryDirectory() as extract_dir:
+                os.makedirs(os.path.join(extract_dir, "ethereum"))
+                FlipsideApi.export_address(table, np.array([address]), extract_dir, "ethereum", export_format)
+                for table_append in [table_incremental, table_incremental_null]:
+                    FlipsideApi.export_address(table_append, np.array([address]), extract_dir, "ethereum",
+                                               export_format, append=True)
+                file_path = os.path.join(extract_dir, "ethereum", f"{address}_tx.{export_format}")
+                if export_format == "parquet":
+                    df_output = pd.read_parquet(file_path)
+                else:
+                    df_output = pd.read_csv(file_path)
+                self.assertEqual(["0x1", "0x2", "0x3", "0x4"], list(df_output.tx_hash))
+                self.assertEqual([0.5, 1.5, 2.0, 0.0], [float(value) for value in df_output.eth_value])
+                self.assertEqual(1, df_output.to_address.isna().sum())
+
     def test_execute_get_tx_eth(self):
         sql = self.flipside_api.get_eth_transactions_sql_query(
             self.list_unique_address, limit=10)
@@ -99,9 +224,9 @@ class FlipsideApiTest(unittest.TestCase):
     def test_extract_tx_eth(self):
         tx_chain = "ethereum"
         self.flipside_api.extract_transactions_net(self.PATH_TO_TMP_TX, self.test_address, tx_chain)
-        df_output = pd.read_csv(os.path.join(
+        df_output = pd.read_parquet(os.path.join(
             os.path.join(self.PATH_TO_TMP_TX, tx_chain),
-            "0x000aa644Afae99d06C9a0ED0E41B1e61bECA958d_tx.csv"))
+            "0x000aa644afae99d06c9a0ed0e41b1e61beca958d_tx.parquet"))
         df_filter = df_output[df_output["block_timestamp"] <= '2023-01-01']
         self.assertEqual(133, df_filter.shape[0])
 
@@ -123,6 +248,169 @@ class FlipsideApiTest(unittest.TestCase):
             '0xe55e3bf2459b3620e3cb54000832e57ce87aa609d759a33459dfbdb84a655741' in df_output.sort_values(
                 "block_timestamp").tx_hash.values)
 
+    def test_concat_tables_type_drift(self):
+        page_1 = pa.Table.from_pylist([{"tx_hash": "0x1", "eth_value": 1, "to_address": None}])
+        page_2 = pa.Table.from_pylist([{"tx_hash": "0x2", "eth_value": 0.5, "to_address": "0xa"}])
+        failed_page = pa.table({})
+        table = concat_tables([page_1, failed_page, page_2])
+        self.assertEqual(pa.float64(), table.schema.field("eth_value").type)
+        self.assertEqual([1.0, 0.5], table["eth_value"].to_pylist())
+        self.assertEqual([None, "0xa"], table["to_address"].to_pylist())
+
+    def test_records_to_table_untyped_column(self):
+        table = records_to_table([{"tx_hash": "0x1", "value": "a"}, {"tx_hash": "0x2", "value": 2 ** 64}])
+        self.assertEqual(["a", str(2 ** 64)], table["value"].to_pylist())
+        self.assertEqual(["0x1", "0x2"], table["tx_hash"].to_pylist())
+
+    def test_load_address_transactions_re_extract(self):
+        addresses = [f"0x{i:040x}" for i in range(4)]
+        records = [{"tx_hash": f"0x{i:064x}", "block_timestamp": f"2022-01-{i + 1:02d}",
+                    "from_address": addresses[i % 4], "to_address": addresses[(i + 1) % 4]} for i in range(12)]
+        flipside_api = FlipsideApi(self.api_key, max_address=2, retry_interval=0, export_format="chunk")
+        flipside_api.sdk = self.get_offline_sdk(records)
+        with tempfile.TemporaryDirectory() as extract_dir:
+            flipside_api.extract_transactions_net(extract_dir, np.array(addresses[:2]), "ethereum")
+            # same slice indexes, different addresses
+            flipside_api.extract_transactions_net(extract_dir, np.array(addresses[2:]), "ethereum")
+            # same addresses, different chunks
+            flipside_api.MAX_ADDRESS = 1
+            flipside_api.extract_transactions_net(extract_dir, np.array(addresses[:2]), "ethereum")
+            # incremental extract, the previous files are kept
+            flipside_api.extract_transactions_net(extract_dir, np.array(addresses[:2]), "ethereum",
+                                                  min_block_timestamp="2022-01-06")
+            # failed extract, the previous files are kept
+            flipside_api.sdk = self.get_offline_sdk(records, fail=lambda sql, page_number: True)
+            flipside_api.extract_transactions_net(extract_dir, np.array(addresses), "ethereum")
+            for address in addresses:
+                df_output = FlipsideApi.load_address_transactions(extract_dir, "ethereum", address)
+                expected = sorted(record["tx_hash"] for record in records
+                                  if address in (record["from_address"], record["to_address"]))
+                self.assertEqual(expected, sorted(df_output.tx_hash))
+
+    def test_extract_tx_by_time_failed_query(self):
+        address = "0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82"
+        records = [{"tx_hash": f"0x{i:064x}", "block_timestamp": f"2022-01-{i + 1:02d}",
+                    "from_address": address, "to_address": "0xa"} for i in range(5)]
+        flipside_api = FlipsideApi(self.api_key, export_format="csv")
+        flipside_api.MAX_ROWS = 3
+        flipside_api.sdk = self.get_offline_sdk(records, fail=lambda sql, page_number: "ORDER BY" in sql)
+        self.assertEqual(0, flipside_api.get_transactions_by_time(address, "ethereum").num_rows)
+        with tempfile.TemporaryDirectory() as extract_dir:
+            flipside_api.extract_transactions_net(extract_dir, np.array([address]), "ethereum")
+            self.assertEqual([], os.listdir(os.path.join(extract_dir, "ethereum")))
+
+    def test_extract_tx_empty_or_failed_chunk(self):
+        addresses = np.array([f"0x{i:040x}" for i in range(100)])
+        flipside_api = FlipsideApi(self.api_key, max_address=100, retry_interval=0)
+        with tempfile.TemporaryDirectory() as extract_dir:
+            # no transactions, the chunk is not bisected
+            offline_sdk = self.get_offline_sdk([])
+            flipside_api.sdk = offline_sdk
+            flipside_api.extract_transactions_net(extract_dir, addresses, "gnosis")
+            self.assertEqual(1, offline_sdk.query.call_count)
+            # a query failing for another reason than a timeout is retried as is, not bisected
+            offline_sdk = self.get_offline_sdk([], fail=lambda sql, page_number: True)
+            flipside_api.sdk = offline_sdk
+            flipside_api.extract_transactions_net(extract_dir, addresses, "gnosis")
+            self.assertEqual(flipside_api.QUERY_RETRIES + 1, offline_sdk.query.call_count)
+            # a timed out query is bisected
+            offline_sdk = self.get_offline_sdk([], fail=lambda sql, page_number: sql.count("LOWER") > 50 * 2,
+                                               error=QueryRunTimeoutError(4))
+            flipside_api.sdk = offline_sdk
+            flipside_api.extract_transactions_net(extract_dir, addresses, "gnosis")
+            self.assertEqual(3, offline_sdk.query.call_count)
+
+    def test_extract_tx_failed_page_not_exported(self):
+        addresses = [f"0x{i:040x}" for i in range(20)]
+        records = [{"tx_hash": f"0x{i:064x}", "block_timestamp": "2022-01-01",
+                    "from_address": addresses[i % 20], "to_address": "0xa"} for i in range(59)]
+        for export_format in ["parquet", "csv", "chunk"]:
+            flipside_api = FlipsideApi(self.api_key, page_size=10, max_address=20, retry_interval=0,
+                                       export_format=export_format)
+            flipside_api.sdk = self.get_offline_sdk(records, fail=lambda sql, page_number: page_number == 3)
+            with tempfile.TemporaryDirectory() as extract_dir:
+                flipside_api.extract_transactions_net(extract_dir, np.array(addresses), "ethereum")
+                path_to_network = os.path.join(extract_dir, "ethereum")
+                if export_format == "chunk":
+                    self.assertEqual(["manifest.parquet"], os.listdir(path_to_network))
+                    df_manifest = pd.read_parquet(os.path.join(path_to_network, "manifest.parquet"))
+                    self.assertEqual(0, df_manifest.shape[0])
+                else:
+                    self.assertEqual([], os.listdir(path_to_network))
+
+    def get_extracted_slices(self, n_address, max_address, max_concurrent_queries, fail=None):
+        # top level slices of the extraction in the order they are queried, the bisection of failed slices is skipped
+        addresses = np.array([f"0x{i:040x}" for i in range(n_address)])
+        flipside_api = FlipsideApi(self.api_key, max_address=max_address,
+                                   max_concurrent_queries=max_concurrent_queries)
+        flipside_api.sdk = self.get_offline_sdk([], fail=fail, error=QueryRunTimeoutError(4))
+        with tempfile.TemporaryDirectory() as extract_dir, \
+                mock.patch.object(flipside_api, "extract_transactions_rec"), \
+                mock.patch.object(flipside_api, "get_transactions_sql_query",
+                                  wraps=flipside_api.get_transactions_sql_query) as get_sql_query:
+            flipside_api.extract_transactions_net(extract_dir, addresses, "ethereum")
+        slices = []
+        for call in get_sql_query.call_args_list:
+            indexes = [int(address, 16) for address in call.args[0]]
+            slices.append((indexes[0], indexes[-1] + 1))
+        return slices
+
+    def assert_slices_cover(self, slices, n_address):
+        sorted_slices = sorted(slices)
+        self.assertEqual(0, sorted_slices[0][0])
+        self.assertEqual(n_address, sorted_slices[-1][1])
+        for (start, end), (next_start, next_end) in zip(sorted_slices, sorted_slices[1:]):
+            self.assertEqual(end, next_start)
+
+    def test_extract_tx_aimd_chunk_size(self):
+        # halved when a slice times out, +25% after 3 successes in a row
+        slices = self.get_extracted_slices(200, 10, 1, fail=lambda sql, page_number: sql.count("LOWER") > 15 * 2)
+        sizes = [end - start for start, end in slices]
+        self.assertEqual([10, 10, 10, 12, 12, 12, 15, 15, 15, 18, 9, 9, 9, 11], sizes[:14])
+        self.assert_slices_cover(slices, 200)
+        # capped at 2 * max_address
+        slices = self.get_extracted_slices(60, 2, 1)
+        sizes = [end - start for start, end in slices]
+        self.assertEqual([2, 2, 2, 3, 3, 3, 4, 4, 4, 4], sizes[:10])
+        self.assertEqual(4, max(sizes))
+        self.assert_slices_cover(slices, 60)
+        # concurrent workers share the cursor, the slices never overlap nor leave gaps
+        slices = self.get_extracted_slices(500, 10, 4, fail=lambda sql, page_number: "0x" + "0" * 38 + "07" in sql)
+        self.assert_slices_cover(slices, 500)
+
+    def test_execute_query_table_failed_page_not_cached(self):
+        address = "0x06cd8288dc001024ce0a1cf39caaedc0e2db9c82"
+        records = [{"tx_hash": f"0x{i:064x}", "block_timestamp": "2022-01-01",
+                    "from_address": address, "to_address": "0xa"} for i in range(30)]
+        flipside_api = FlipsideApi(self.api_key, page_size=10)
+        sql = flipside_api.get_eth_transactions_sql_query([address])
+        flipside_api.sdk = self.get_offline_sdk(records, fail=lambda sql, page_number: page_number == 2)
+        self.assertEqual(10, flipside_api.execute_query_table(sql).num_rows)
+        offline_sdk = self.get_offline_sdk(records)
+        flipside_api.sdk = offline_sdk
+        self.assertEqual(30, flipside_api.execute_query_table(sql).num_rows)
+        n_calls = offline_sdk.query.call_count
+        self.assertEqual(30, flipside_api.execute_query_table(sql).num_rows)
+        self.assertEqual(n_calls, offline_sdk.query.call_count)
+
+    def test_timeout_minutes_bounds(self):
+        flipside_api = FlipsideApi(self.api_key, timeout_minutes=4)
+        flipside_api.sdk = mock.Mock()
+        sql = flipside_api.get_eth_transactions_sql_query(self.list_unique_address)
+        flipside_api.sdk.query.side_effect = ConnectionError("502 Bad Gateway")
+        for _ in range(10):
+            flipside_api.execute_query_no_cache(sql, "ethereum")
+        self.assertEqual(4, flipside_api.get_timeout_minutes("ethereum"))
+        flipside_api.sdk.query.side_effect = QueryRunTimeoutError(4)
+        for _ in range(10):
+            flipside_api.execute_query_no_cache(sql, "ethereum")
+        self.assertEqual(8, flipside_api.get_timeout_minutes("ethereum"))
+        flipside_api.sdk.query.side_effect = None
+        flipside_api.sdk.query.return_value = SimpleNamespace(records=[])
+        for _ in range(20):
+            flipside_api.execute_query_no_cache(sql, "ethereum")
+        self.assertEqual(2, flipside_api.get_timeout_minutes("ethereum"))
+
 
 if __name__ == '__main__':
     unittest.main()